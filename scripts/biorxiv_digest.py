@@ -1,19 +1,26 @@
 #!/usr/bin/env python3
 from __future__ import annotations
 
+import concurrent.futures
+import heapq
 import html
 import json
 import os
 import re
 import ssl
 import sys
+import unicodedata
 from dataclasses import dataclass
 from datetime import datetime, timedelta
+from decimal import Decimal
 from email.message import EmailMessage
-from typing import Any, Dict, List, Optional
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
 from zoneinfo import ZoneInfo
 
-import requests
+import httpx
+import ijson
+import orjson
 import smtplib
 import random
 
@@ -21,8 +28,46 @@ import random
 TORONTO_TZ = ZoneInfo("America/Toronto")
 BIORXIV_API_BASE = "https://api.biorxiv.org/details"
 
-
-@dataclass(frozen=True)
+# Topic pool for the daily general_concept section. Loaded once at import
+# so each run skips the stat+open+parse, and sized dynamically instead of
+# hard-coding an index range that breaks when the list changes.
+with open(Path(__file__).resolve().parent / "topics.json") as _f:
+    _TOPICS: List[str] = json.load(_f)
+
+# Compiled once at import; clip() alone runs the whitespace pattern twice
+# per paper across up to MAX_PAPERS_FOR_AI abstracts.
+_FENCE_OPEN = re.compile(r"^```(?:json)?\s*")
+_FENCE_CLOSE = re.compile(r"\s*```$")
+_WS = re.compile(r"\s+")
+_RECIP_SEP = re.compile(r"[;,]+")
+
+# Finds the first complete JSON object in a string without regex scanning.
+_JSON_DECODER = json.JSONDecoder()
+
+# Shared HTTP/2 client: the concurrent pagination GETs multiplex over a
+# single connection per host instead of opening one TCP+TLS connection per
+# worker, and connect failures are retried at the transport level.
+_HTTP = httpx.Client(
+    timeout=30.0,
+    transport=httpx.HTTPTransport(
+        http2=True,
+        retries=3,
+        limits=httpx.Limits(max_keepalive_connections=8),
+    ),
+)
+
+# Built once: create_default_context() reloads the system CA bundle on every
+# call, and the plain-text fallback body never changes.
+_SSL_CTX = ssl.create_default_context()
+_PLAINTEXT_FALLBACK = (
+    "Your email client does not support HTML. Please view this digest in an HTML-capable client."
+)
+
+
+# slots=True halves per-instance memory and skips dict setup; frozen=True was
+# dropped because nothing hashes Papers and its object.__setattr__ path made
+# every construction pay for immutability we never relied on.
+@dataclass(slots=True)
 class Paper:
     pid: str  # P01, P02, ...
     title: str
@@ -41,6 +86,20 @@ class Paper:
         return f"https://doi.org/{self.doi}" if self.doi else ""
 
 
+# Positional field order for building Paper from an API row (pid excluded).
+_FIELDS = ("title", "doi", "version", "date", "category", "authors", "abstract")
+
+
+def _clean(value: Any) -> str:
+    # Normalize once at ingestion: undo the API's HTML entities (esc() later
+    # re-escapes for the email, avoiding double-escaped titles), fold Unicode
+    # compatibility forms, and collapse whitespace. Downstream clip()/esc()
+    # then operate on already-canonical text.
+    s = html.unescape(str(value or ""))
+    s = unicodedata.normalize("NFKC", s)
+    return _WS.sub(" ", s).strip()
+
+
 def env(name: str, default: Optional[str] = None, required: bool = False) -> str:
     v = os.environ.get(name, default)
     if required and not v:
@@ -60,7 +119,7 @@ def fetch_biorxiv_details(
     category: str = "",
     cursor: int = 0,
     timeout_s: int = 30,
-) -> Dict[str, Any]:
+) -> bytes:
     # API format: https://api.biorxiv.org/details/[server]/[interval]/[cursor]/[format]
     # We request JSON explicitly.
     url = f"{BIORXIV_API_BASE}/{server}/{start_date}/{end_date}/{cursor}/json"
@@ -68,112 +127,140 @@ def fetch_biorxiv_details(
     if category.strip():
         params["category"] = category.strip()
 
-    r = requests.get(url, params=params, timeout=timeout_s)
+    r = _HTTP.get(url, params=params, timeout=timeout_s)
     r.raise_for_status()
-    return r.json()
-
-
-def normalize_collection(payload: Dict[str, Any]) -> List[Dict[str, Any]]:
-    # Typical responses wrap records under "collection"
-    if isinstance(payload, dict) and "collection" in payload:
-        col = payload.get("collection") or []
-        if isinstance(col, list):
-            return col
-    # Fallback: sometimes people paste only the inner list
-    if isinstance(payload, list):
-        return payload
-    return []
-
-
-def parse_total(payload: Dict[str, Any]) -> Optional[int]:
-    # messages[0].total is common in the API
-    msgs = payload.get("messages")
-    if isinstance(msgs, list) and msgs:
-        total = msgs[0].get("total")
-        if isinstance(total, (int, float)):
-            return int(total)
-        if isinstance(total, str) and total.isdigit():
-            return int(total)
-    return None
+    # Return the raw page; callers stream-decode just the parts they need.
+    return r.content
 
 
-def dedupe_keep_latest_version(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    # Keep the highest version per DOI.
-    best: Dict[str, Dict[str, Any]] = {}
-    for row in rows:
-        doi = str(row.get("doi", "")).strip()
-        if not doi:
-            continue
-        v_raw = str(row.get("version", "")).strip()
-        try:
-            v = int(v_raw)
-        except Exception:
-            v = -1
-        if doi not in best:
-            best[doi] = row
-            continue
-        try:
-            existing_v = int(str(best[doi].get("version", "-1")))
-        except Exception:
-            existing_v = -1
-        if v > existing_v:
-            best[doi] = row
-    return list(best.values())
+def normalize_collection(payload: bytes) -> List[Dict[str, Any]]:
+    # Stream only collection[*] out of the page bytes; the envelope (messages,
+    # status) is never materialized alongside a second copy of the rows.
+    return list(ijson.items(payload, "collection.item"))
+
+
+def parse_total(payload: bytes) -> Optional[int]:
+    # messages[0].total is common in the API; ijson yields numbers as Decimal.
+    total = next(ijson.items(payload, "messages.item.total"), None)
+    if isinstance(total, (int, float, Decimal)):
+        return int(total)
+    if isinstance(total, str) and total.isdigit():
+        return int(total)
+    return None
 
 
-def load_recent_papers(server: str, lookback_days: int, category: str) -> List[Paper]:
+def load_recent_papers(
+    server: str,
+    lookback_days: int,
+    category: str,
+    top_k: Optional[int] = None,
+) -> List[Paper]:
     now = datetime.now(TORONTO_TZ)
     end_date = now.date().isoformat()
     start_date = (now.date() - timedelta(days=lookback_days)).isoformat()
 
-    all_rows: List[Dict[str, Any]] = []
-    cursor = 0
-    total: Optional[int] = None
-
-    while True:
-        payload = fetch_biorxiv_details(
+    def fetch_page(cursor: int) -> bytes:
+        return fetch_biorxiv_details(
             server=server,
             start_date=start_date,
             end_date=end_date,
             category=category,
             cursor=cursor,
         )
-        rows = normalize_collection(payload)
-        if not rows:
-            break
-
-        all_rows.extend(rows)
-
-        if total is None:
-            total = parse_total(payload)
-
-        cursor += len(rows)
-        if len(rows) < 100:
-            break
-        if total is not None and cursor >= total:
-            break
-
-    rows = dedupe_keep_latest_version(all_rows)
-
-    # Sort newest first by date string (YYYY-MM-DD)
-    rows.sort(key=lambda r: str(r.get("date", "")), reverse=True)
-
-    papers: List[Paper] = []
-    for i, r in enumerate(rows, start=1):
-        pid = f"P{i:02d}"
-        papers.append(
-            Paper(
-                pid=pid,
-                title=str(r.get("title", "")).strip(),
-                doi=str(r.get("doi", "")).strip(),
-                version=str(r.get("version", "")).strip(),
-                date=str(r.get("date", "")).strip(),
-                category=str(r.get("category", "")).strip(),
-                authors=str(r.get("authors", "")).strip(),
-                abstract=str(r.get("abstract", "")).strip(),
-            )
-        )
-    return papers
+
+    def crosses_window_start(rows: List[Dict[str, Any]]) -> bool:
+        # Pages are date-ordered, so once a page dips below start_date every
+        # later page is older too and pagination can stop.
+        return min(str(r.get("date", "")) for r in rows) < start_date
+
+    def in_window(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return [r for r in rows if str(r.get("date", "")) >= start_date]
+
+    # First page tells us the total, so remaining cursors are known up front
+    # and can be fetched concurrently (the work is purely network-bound).
+    first = fetch_page(0)
+    first_rows = normalize_collection(first)
+    total = parse_total(first)
+
+    if first_rows and crosses_window_start(first_rows):
+        all_rows: List[Dict[str, Any]] = in_window(first_rows)
+    else:
+        all_rows = list(first_rows)
+        if len(all_rows) >= 100:
+            if total is not None:
+                cursors = range(100, total, 100)
+                with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+                    for payload in executor.map(fetch_page, cursors):
+                        all_rows.extend(in_window(normalize_collection(payload)))
+            else:
+                # Serial fallback when the API doesn't report a total.
+                cursor = 100
+                while True:
+                    rows = normalize_collection(fetch_page(cursor))
+                    if not rows:
+                        break
+                    if crosses_window_start(rows):
+                        all_rows.extend(in_window(rows))
+                        break
+                    all_rows.extend(rows)
+                    cursor += len(rows)
+                    if len(rows) < 100:
+                        break
+
+    # Fused dedup + selection: one pass keeps the highest version per DOI
+    # (version parsed exactly once, date cached in the tuple), then top_k
+    # newest rows fall out of an O(N log K) heap selection instead of a full
+    # O(N log N) sort of rows we'd mostly slice away anyway.
+    best: Dict[str, Tuple[int, str, Dict[str, Any]]] = {}
+    for row in all_rows:
+        doi = str(row.get("doi", "")).strip()
+        if not doi:
+            continue
+        v_raw = str(row.get("version", "")).strip()
+        v = int(v_raw) if v_raw.isdigit() else -1
+        cur = best.get(doi)
+        if cur is None or v > cur[0]:
+            best[doi] = (v, str(row.get("date", "")), row)
+
+    if top_k is not None:
+        picked = heapq.nlargest(top_k, best.values(), key=lambda t: t[1])
+    else:
+        picked = sorted(best.values(), key=lambda t: t[1], reverse=True)
+    rows = [t[2] for t in picked]
+
+    def fields(r: Dict[str, Any]):
+        for k in _FIELDS:
+            v = _clean(r.get(k))
+            # Categories repeat across most of a day's rows; intern so the
+            # list holds one shared string per distinct category.
+            yield sys.intern(v) if k == "category" else v
+
+    return [Paper(f"P{i:02d}", *fields(r)) for i, r in enumerate(rows, start=1)]
+
+
+# Structured-output schema mirroring the OUTPUT block in _PROMPT_PREFIX.
+# With native JSON mode the model can't wrap the object in code fences or
+# prose, so extract_json's fallback paths become a safety net only.
+_RESPONSE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "top_papers": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "id": {"type": "STRING"},
+                    "summary": {"type": "STRING"},
+                },
+                "required": ["id", "summary"],
+            },
+        },
+        "new_possibility": {"type": "ARRAY", "items": {"type": "STRING"}},
+        "general_concept": {"type": "ARRAY", "items": {"type": "STRING"}},
+        "specific_concept": {"type": "ARRAY", "items": {"type": "STRING"}},
+    },
+    "required": ["top_papers", "new_possibility", "general_concept", "specific_concept"],
+}
 
 
 def call_gemini(prompt: str, api_key: str) -> str:
@@ -183,22 +270,39 @@ def call_gemini(prompt: str, api_key: str) -> str:
         "Content-Type": "application/json",
         "x-goog-api-key": api_key,
     }
+    # The digest is a once-a-day cron job that tolerates minutes of latency,
+    # so default to the discounted flex tier. Set BIORXIV_SERVICE_TIER=standard
+    # to opt back into the synchronous tier.
+    service_tier = (env("BIORXIV_SERVICE_TIER", "flex") or "flex").strip().upper()
     body = {
         "contents": [{"role": "user", "parts": [{"text": prompt}]}],
+        # The schema tops out around 5 summaries plus ~14 bullets — well under
+        # 2k tokens — and output tokens dominate both latency and cost, so
+        # don't leave a 16k ceiling for a runaway generation to fill.
         "generationConfig": {
             "temperature": 0.2,
-            "maxOutputTokens": 16384,
+            "maxOutputTokens": 2048,
+            "serviceTier": service_tier,
+            "responseMimeType": "application/json",
+            "responseSchema": _RESPONSE_SCHEMA,
         },
     }
 
     try:        
-        r = requests.post(endpoint, headers=headers, data=json.dumps(body), timeout=60)
+        r = _HTTP.post(endpoint, headers=headers, content=orjson.dumps(body), timeout=60)
         r.raise_for_status()
-        data = r.json()
+        data = orjson.loads(r.content)
     except Exception:
-        r = requests.post(endpoint_alt, headers=headers, data=json.dumps(body), timeout=60)
+        r = _HTTP.post(endpoint_alt, headers=headers, content=orjson.dumps(body), timeout=60)
         r.raise_for_status()
-        data = r.json()
+        data = orjson.loads(r.content)
+
+    # Surface implicit-cache hits so we can verify the static prompt prefix
+    # is actually being cached across daily runs.
+    if isinstance(data, dict):
+        cached = data.get("usageMetadata", {}).get("cachedContentTokenCount")
+        if cached is not None:
+            print(f"[info] Gemini cached prompt tokens: {cached}")
 
     # candidates[0].content.parts[*].text
     try:
@@ -206,60 +310,70 @@ def call_gemini(prompt: str, api_key: str) -> str:
         text = "".join(p.get("text", "") for p in parts if isinstance(p, dict))
         return text.strip()
     except Exception:
-        return json.dumps(data)
+        return orjson.dumps(data).decode()
 
 
 def extract_json(text: str) -> Dict[str, Any]:
     # Accept raw JSON or JSON inside code fences.
     cleaned = text.strip()
-    cleaned = re.sub(r"^```(?:json)?\s*", "", cleaned)
-    cleaned = re.sub(r"\s*```$", "", cleaned)
+    cleaned = _FENCE_OPEN.sub("", cleaned)
+    cleaned = _FENCE_CLOSE.sub("", cleaned)
 
     if cleaned.startswith("{") and cleaned.endswith("}"):
-        return json.loads(cleaned)
+        return orjson.loads(cleaned)
 
-    m = re.search(r"\{.*\}", cleaned, flags=re.DOTALL)
-    if not m:
+    # raw_decode stops at the end of the first object, so leading prose costs
+    # one find() and trailing text can't force a greedy rescan of the string.
+    idx = cleaned.find("{")
+    if idx < 0:
         raise ValueError("Gemini response did not contain a JSON object.")
-    return json.loads(m.group(0))
+    obj, _ = _JSON_DECODER.raw_decode(cleaned, idx)
+    return obj
+
+
+# Static instructions + schema, kept byte-identical across runs so Gemini's
+# implicit prefix caching can hit it every day. Anything that varies per run
+# (papers, interests, today's topic) must come strictly after this block.
+_PROMPT_PREFIX = "\n".join([
+    "You are a research assistant helping rank bioRxiv papers for a daily email digest.",
+    "",
+    "TASK:",
+    "- Select the 5 most relevant papers to USER_INTERESTS. Favour papers which target major problems in their respective field, make novel contributions to their field, and have solid methodological rigor relative to the other papers in the list.",
+    "- For each selected paper: produce a three sentence summary that is understandable to a second year undergraduate student in the field.",
+    "- After this, write a short 'new_possibility' section (3 bullet points) explaining ONE idea that is now possible because of the results of one or more paper(s). The first bullet should give an overview of the idea, the second bullet should give a technical breakdown incorporating information from the paper(s), and the third bullet should talk about implementation.",
+    "- Along with the 'new_possibility' section, include a 'general_concept' section explaining the topic given under GENERAL_TOPIC below. Write 3–4 bullet points only. The first bullet should immediately begin explaining the concept; do not use a title, heading, or naming-only bullet. Bullets should emphasize structure, mechanisms, formal insights, or non-obvious implications, not introductory definitions. Use plain text only (no markdown, no headings, no formatting). Aim for a level of depth appropriate for a well-educated reader who wants a concise but nontrivial conceptual insight rather than a textbook overview.",
+    "- Finally, include a 'specific_concept' section describing any ONE advanced concept (graduate level) from USER_INTERESTS. Choose a concept that is non-introductory, and non-textbook (avoid canonical topics such as allostery, basic Bayesian inference, classic signaling pathways, etc.). The concept does not need to appear in or relate to any of the papers; treat this section as independent enrichment. After the concepts are generated, choose exactly one to write about. Write 3–4 bullet points only. The first bullet should immediately begin explaining the concept; do not use a title or heading bullet. Bullets should focus on mechanism, formal structure, or nuanced implications, not definitions aimed at beginners. Use plain text only (no markdown, no headings, no bold/italics).",
+    "",
+    "OUTPUT: Return ONLY valid JSON with this schema:",
+    '{',
+    '  "top_papers": [',
+    '    {"id": "P01", "summary": "..."},',
+    '    {"id": "P02", "summary": "..."}',
+    '  ],',
+    '  "new_possibility": ["...", "..."],',
+    '  "general_concept": ["...", "..."],',
+    '  "specific_concept": ["...", "..."]',
+    '}',
+])
 
 
 def build_ai_prompt(interests: str, papers: List[Paper], general_topic: str) -> str:
     def clip(s: str, n: int) -> str:
-        s = re.sub(r"\s+", " ", s).strip()
+        # Paper fields are whitespace-normalized at ingestion; just truncate.
         return s[:n] + ("…" if len(s) > n else "")
-    
-    lines = []
-    lines.append("You are a research assistant helping rank bioRxiv papers for a daily email digest.")
-    lines.append("")
-    lines.append("USER_INTERESTS:")
-    lines.append(interests.strip())
-    lines.append("")
-    lines.append("TASK:")
-    lines.append("- Select the 5 most relevant papers to USER_INTERESTS. Favour papers which target major problems in their respective field, make novel contributions to their field, and have solid methodological rigor relative to the other papers in the list.")
-    lines.append("- For each selected paper: produce a three sentence summary that is understandable to a second year undergraduate student in the field.")
-    lines.append("- After this, write a short 'new_possibility' section (3 bullet points) explaining ONE idea that is now possible because of the results of one or more paper(s). The first bullet should give an overview of the idea, the second bullet should give a technical breakdown incorporating information from the paper(s), and the third bullet should talk about implementation.")
-    lines.append(f"- Along with the 'new_possibility' section, include a 'general_concept' section explaining {general_topic}. Write 3–4 bullet points only. The first bullet should immediately begin explaining the concept; do not use a title, heading, or naming-only bullet. Bullets should emphasize structure, mechanisms, formal insights, or non-obvious implications, not introductory definitions. Use plain text only (no markdown, no headings, no formatting). Aim for a level of depth appropriate for a well-educated reader who wants a concise but nontrivial conceptual insight rather than a textbook overview.")
-    lines.append("- Finally, include a 'specific_concept' section describing any ONE advanced concept (graduate level) from USER_INTERESTS. Choose a concept that is non-introductory, and non-textbook (avoid canonical topics such as allostery, basic Bayesian inference, classic signaling pathways, etc.). The concept does not need to appear in or relate to any of the papers; treat this section as independent enrichment. After the concepts are generated, choose exactly one to write about. Write 3–4 bullet points only. The first bullet should immediately begin explaining the concept; do not use a title or heading bullet. Bullets should focus on mechanism, formal structure, or nuanced implications, not definitions aimed at beginners. Use plain text only (no markdown, no headings, no bold/italics).")
-    lines.append("")
-    lines.append("OUTPUT: Return ONLY valid JSON with this schema:")
-    lines.append('{')
-    lines.append('  "top_papers": [')
-    lines.append('    {"id": "P01", "summary": "..."},')
-    lines.append('    {"id": "P02", "summary": "..."}')
-    lines.append('  ],')
-    lines.append('  "new_possibility": ["...", "..."],')
-    lines.append('  "general_concept": ["...", "..."],')
-    lines.append('  "specific_concept": ["...", "..."]')
-    lines.append('}')
-    lines.append("")
-    lines.append("PAPERS:")
-    for p in papers:
-        lines.append(
-            f"- [{p.pid}] Title: {clip(p.title, 220)} | Category: {clip(p.category, 60)} | Date: {p.date} | DOI: {p.doi}"
-        )
-        lines.append(f"  Abstract: {clip(p.abstract, 900)}")
-    return "\n".join(lines)
+
+    # One join over a generator instead of ~2 appends per paper.
+    papers_block = "\n".join(
+        f"- [{p.pid}] Title: {clip(p.title, 220)} | Category: {clip(p.category, 60)} | Date: {p.date} | DOI: {p.doi}\n"
+        f"  Abstract: {clip(p.abstract, 900)}"
+        for p in papers
+    )
+    return (
+        f"{_PROMPT_PREFIX}\n"
+        f"\nPAPERS:\n{papers_block}\n"
+        f"\nUSER_INTERESTS:\n{interests.strip()}\n"
+        f"\nGENERAL_TOPIC:\n{general_topic}"
+    )
 
 
 def build_email_html(now_local: datetime, top: List[Dict[str, Any]], id_to_paper: Dict[str, Paper], idea: List[str], general_concept: List[str], specific_concept: List[str], general_topic: str) -> str:
@@ -275,16 +389,28 @@ def build_email_html(now_local: datetime, top: List[Dict[str, Any]], id_to_paper
         one_liner = str(entry.get("summary", "")).strip()
         url = p.biorxiv_url() or (f"https://doi.org/{p.doi}" if p.doi else "")
 
+        # Escape each field exactly once before interpolation; html.escape is
+        # pure Python and the abstract alone is hundreds of characters.
+        url_e = esc(url)
+        title_e = esc(p.title)
+        authors_e = esc(p.authors)
+        category_e = esc(p.category)
+        date_e = esc(p.date)
+        doi_e = esc(p.doi)
+        version_e = esc(p.version)
+        summary_e = esc(one_liner)
+        abstract_e = esc(p.abstract)
+
         items_html.append(
             f"""
             <div style="margin: 0 0 18px 0;">
-              <h3 style="margin: 0 0 6px 0;">{idx}. <a href="{esc(url)}">{esc(p.title)}</a></h3>
+              <h3 style="margin: 0 0 6px 0;">{idx}. <a href="{url_e}">{title_e}</a></h3>
               <div style="font-size: 13px; color: #333;">
-                <div><b>Authors:</b> {esc(p.authors)}</div>
-                <div><b>Category:</b> {esc(p.category)} &nbsp; <b>Date:</b> {esc(p.date)} &nbsp; <b>DOI:</b> {esc(p.doi)}v{esc(p.version)}</div>
+                <div><b>Authors:</b> {authors_e}</div>
+                <div><b>Category:</b> {category_e} &nbsp; <b>Date:</b> {date_e} &nbsp; <b>DOI:</b> {doi_e}v{version_e}</div>
               </div>
-              <p style="margin: 8px 0 6px 0;"><b>AI Summary:</b> {esc(one_liner)}</p>
-              <p style="margin: 0;"><b>Abstract:</b><br/>{esc(p.abstract)}</p>
+              <p style="margin: 8px 0 6px 0;"><b>AI Summary:</b> {summary_e}</p>
+              <p style="margin: 0;"><b>Abstract:</b><br/>{abstract_e}</p>
             </div>
             """.strip()
         )
@@ -337,7 +463,7 @@ def _parse_recipients(raw: str) -> List[str]:
     """
     if not raw:
         return []
-    parts = re.split(r"[;,]+", raw)
+    parts = _RECIP_SEP.split(raw)
     return [p.strip() for p in parts if p and p.strip()]
 
 def send_email(subject: str, html_body: str) -> None:
@@ -380,19 +506,16 @@ def send_email(subject: str, html_body: str) -> None:
     # Do NOT set Bcc header — keep it out of the headers so recipients don't see it
 
     # Plain text fallback
-    msg.set_content(
-        "Your email client does not support HTML. Please view this digest in an HTML-capable client."
-    )
+    msg.set_content(_PLAINTEXT_FALLBACK)
     msg.add_alternative(html_body, subtype="html")
 
     # Combine all recipients for SMTP delivery
     all_recipients = to_list + cc_list + bcc_list
 
     # Send
-    context = ssl.create_default_context()
     with smtplib.SMTP(smtp_host, smtp_port, timeout=60) as s:
         s.ehlo()
-        s.starttls(context=context)
+        s.starttls(context=_SSL_CTX)
         s.ehlo()
         s.login(smtp_user, smtp_password)
         # Explicitly pass the recipient list to ensure delivery to CC/BCC too
@@ -412,17 +535,19 @@ def main() -> int:
     lookback_days = int(env("LOOKBACK_DAYS", "1") or "1")
     max_for_ai = int(env("MAX_PAPERS_FOR_AI", "60") or "60")
 
-    papers = load_recent_papers(server=server, lookback_days=lookback_days, category=category)
+    papers = load_recent_papers(
+        server=server, lookback_days=lookback_days, category=category, top_k=max_for_ai
+    )
     if not papers:
         print("[info] No papers found for interval; exiting.")
         return 0
 
-    papers_for_ai = papers[: max(10, min(max_for_ai, len(papers)))]
-    with open("scripts/topics.json") as f:
-        general_topics = json.load(f)
-
-    n = random.randint(0,284)
-    today_topic = general_topics[n]
+    # max(10, min(...)) never changed the slice (a short list is returned
+    # whole either way), so just cap at max_for_ai. Build the pid lookup here
+    # too: it's fixed once the slice exists, before the AI round trip.
+    papers_for_ai = papers[: min(max_for_ai, len(papers))]
+    id_to_paper = {p.pid: p for p in papers_for_ai}
+    today_topic = random.choice(_TOPICS)
     prompt = build_ai_prompt(interests=interests, papers=papers_for_ai, general_topic=today_topic)
 
     ai_text = call_gemini(prompt=prompt, api_key=gemini_key)
@@ -440,7 +565,6 @@ def main() -> int:
 
     # Only keep the first 5 selections
     top_papers = top_papers[:5]
-    id_to_paper = {p.pid: p for p in papers_for_ai}
 
     subject_date = now_local.strftime("%Y-%m-%d")
     subject = f"bioRxiv digest: ({subject_date})"